@@ -1,9 +1,12 @@
 import logging
+import os
 import re
+from concurrent.futures import ThreadPoolExecutor
 from functools import reduce
 from itertools import groupby
 from pathlib import Path
 from re import Pattern
+from tempfile import mkstemp
 
 import git
 import yaml
@@ -15,10 +18,15 @@ from kfcicli.images import ImageReference, get_tags
 from kfcicli.metadata import InputError, get as get_metadata, SourceMetadata
 from kfcicli.repository import Client, create_repository_client_from_url, \
     GitCredentials
-from kfcicli.utils import WithLogging, safe
+from kfcicli.utils import WithLogging, json_dumps, json_loads, safe
 from typing import Callable
 from kfcicli.kubeflow import KubeflowRepo
 
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
 BLACK_LIST = ["https://github.com/canonical/mysql-k8s-operator"]
 
 module_logger = logging.getLogger(__name__)
@@ -103,7 +111,34 @@ class KubeflowCI(WithLogging):
     @classmethod
     def read(cls, filename: Path | str, base_path: Path, credentials: GitCredentials):
         with open(filename, "r") as fid:
-            data = yaml.safe_load(fid)
+            data = yaml.load(fid, Loader=SafeLoader)
+        return cls.from_dict(data, base_path, credentials)
+
+    @classmethod
+    def read_cached(cls, filename: Path | str, base_path: Path, credentials: GitCredentials):
+        """Same as read, but caching the parsed file in a JSON sidecar keyed on its modification time."""
+        filename = Path(filename)
+        cache_filename = filename.with_name(
+            f"{filename.name}.cache.{filename.stat().st_mtime_ns}.json"
+        )
+
+        try:
+            data = json_loads(cache_filename.read_bytes())
+        except (FileNotFoundError, ValueError):
+            # A missing or unreadable sidecar is a miss, and gets parsed and written again
+            with open(filename, "r") as fid:
+                data = yaml.load(fid, Loader=SafeLoader)
+
+            # Sidecars of previous versions of the file can no longer be hit
+            for stale_cache_filename in filename.parent.glob(f"{filename.name}.cache.*.json"):
+                stale_cache_filename.unlink(missing_ok=True)
+
+            # Writing aside and moving into place, so that no reader sees a partial sidecar
+            file_descriptor, temporary_filename = mkstemp(dir=filename.parent, suffix=".tmp")
+            with open(file_descriptor, "wb") as cache_file:
+                cache_file.write(json_dumps(data))
+            os.replace(temporary_filename, cache_filename)
+
         return cls.from_dict(data, base_path, credentials)
 
     @classmethod
@@ -220,57 +255,74 @@ class KubeflowCI(WithLogging):
                     r.create_pull_request(release_branch, title=title,
                                           body=f"Cutting new release for branch {release_branch}")
 
-    def canon_run(
+    def _canon_run_repo(
             self,
+            kubeflow_repo: KubeflowRepo,
             wrapper_func: Callable[[Client,list[LocalCharmRepo],bool],...],
             branch_name: str,
             title: str,
             body: str,
             dry_run: bool = False
     ):
-        for kubeflow_repo in self.repos:
-
-            repo, charms = kubeflow_repo.repository, kubeflow_repo.charms
-
-            current_branch = repo.current_branch
-            hash = repo.current_commit
+        repo, charms = kubeflow_repo.repository, kubeflow_repo.charms
+
+        current_branch = repo.current_branch
+        hash = repo.current_commit
+
+        all_remote_branches = set(reduce(
+            lambda x,y: x+y, repo.remote_branches.values(), []
+        ))
+
+        # Create branch if it does not exists
+        if not (branch_name in repo.branches or branch_name in all_remote_branches):
+            repo.create_branch(branch_name, repo.current_branch)
+        else:
+            try:
+                repo.pull(branch_name, rebase=True)
+            except git.GitCommandError as e:
+                self.logger.warning(f"Error when pulling branch: {e.stderr}")
+
+        with repo.with_branch(branch_name) as r:
+            wrapper_func(r, charms, dry_run)
+
+            if r.current_commit == hash:
+                self.logger.info(
+                    f"Skipping pull-request creation. Base: {hash} Current commit: {r.current_commit}")
+                return
+
+            if dry_run:
+                self.logger.info(
+                    "Skipping pull-request creation in dry-run mode")
+                return
+
+            if pr := repo.get_pull_request(branch_name):
+                self.logger.info(f"Skipping pull request creation. Pull request exists {pr.html_url}")
+                return
+
+            r.create_pull_request(
+                current_branch,
+                title=title,
+                body=body
+            )
 
-            all_remote_branches = set(reduce(
-                lambda x,y: x+y, repo.remote_branches.values(), []
+    def canon_run(
+            self,
+            wrapper_func: Callable[[Client,list[LocalCharmRepo],bool],...],
+            branch_name: str,
+            title: str,
+            body: str,
+            dry_run: bool = False,
+            max_workers: int = 1
+    ):
+        # Repositories are cloned in separate folders, hence they can be processed concurrently
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            list(executor.map(
+                lambda kubeflow_repo: self._canon_run_repo(
+                    kubeflow_repo, wrapper_func, branch_name, title, body, dry_run
+                ),
+                self.repos
             ))
 
-            # Create branch if it does not exists
-            if not (branch_name in repo.branches or branch_name in all_remote_branches):
-                repo.create_branch(branch_name, repo.current_branch)
-            else:
-                try:
-                    repo.pull(branch_name, rebase=True)
-                except git.GitCommandError as e:
-                    self.logger.warning(f"Error when pulling branch: {e.stderr}")
-
-            with repo.with_branch(branch_name) as r:
-                wrapper_func(r, charms, dry_run)
-
-                if r.current_commit == hash:
-                    self.logger.info(
-                        f"Skipping pull-request creation. Base: {hash} Current commit: {r.current_commit}")
-                    continue
-
-                if dry_run:
-                    self.logger.info(
-                        "Skipping pull-request creation in dry-run mode")
-                    continue
-
-                if pr := repo.get_pull_request(branch_name):
-                    self.logger.info(f"Skipping pull request creation. Pull request exists {pr.html_url}")
-                    continue
-
-                r.create_pull_request(
-                    current_branch,
-                    title=title,
-                    body=body
-                )
-
     def pull_request(self, branch_name: str):
         from kfcicli.kubeflow import PullRequests
 
@@ -8,6 +8,11 @@ from pathlib import Path
 import yaml
 from typing import NamedTuple
 
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
 CHARMCRAFT_FILENAME = "charmcraft.yaml"
 CHARMCRAFT_NAME_KEY = "name"
 CHARMCRAFT_LINKS_KEY = "links"
@@ -86,7 +91,7 @@ def _parse_metadata_yaml(metadata_yaml: Path) -> Metadata:
         InputError: if the metadata file does not exist or are malformed.
     """
     try:
-        metadata = yaml.safe_load(metadata_yaml.read_text())
+        metadata = yaml.load(metadata_yaml.read_text(), Loader=SafeLoader)
     except yaml.error.YAMLError as exc:
         raise InputError(
             f"Malformed {METADATA_FILENAME} file, read file: {metadata_yaml}"
@@ -142,7 +147,7 @@ def _parse_charmcraft_yaml(charmcraft_yaml: Path) -> Metadata:
         InputError: if the charmcraft file does not exist or are malformed.
     """
     try:
-        charmcraft = yaml.safe_load(charmcraft_yaml.read_text())
+        charmcraft = yaml.load(charmcraft_yaml.read_text(), Loader=SafeLoader)
     except yaml.error.YAMLError as exc:
         raise InputError(
             f"Malformed {CHARMCRAFT_FILENAME} file, read file: {charmcraft_yaml}"
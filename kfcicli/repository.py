@@ -8,7 +8,7 @@ import logging
 import os.path
 from collections.abc import Sequence
 from contextlib import contextmanager
-from functools import cached_property
+from functools import cached_property, lru_cache
 from itertools import chain
 from typing import Any, cast
 from itertools import groupby
@@ -29,6 +29,7 @@ from itertools import takewhile
 from pathlib import Path
 from typing import NamedTuple
 from kfcicli.metadata import InputError
+from kfcicli.utils import json_loads
 
 GITHUB_HOSTNAME = "github.com"
 ORIGIN_NAME = "origin"
@@ -628,20 +629,22 @@ class Client:  # pylint: disable=too-many-public-methods
                 logging.info("Updating PR with new commit: %s", msg)
                 repo.update_branch(msg, directory=self.docs_path)
 
-    def is_dirty(self, branch_name: str | None = None) -> bool:
+    def is_dirty(self, branch_name: str | None = None, directory: str | Path | None = None) -> bool:
         """Check if repository path has any changes including new files.
 
         Args:
             branch_name: name of the branch to be checked against dirtiness
+            directory: constraint the check to changes in a particular folder only. If None, all
+                the folders are checked.
 
         Returns:
             True if any changes have occurred.
         """
         if branch_name is None:
-            return self._git_repo.is_dirty(untracked_files=True)
+            return self._git_repo.is_dirty(untracked_files=True, path=directory)
 
         with self.with_branch(branch_name) as client:
-            return client.is_dirty()
+            return client.is_dirty(directory=directory)
 
     def tag_exists(self, tag_name: str) -> str | None:
         """Check if a given tag exists.
@@ -777,6 +780,19 @@ class GitCredentials:
     access_token: str
 
 
+@lru_cache
+def read_credentials(filename: Path | str) -> GitCredentials:
+    """Read the Git credentials from a JSON file, parsing each file only once.
+
+    Args:
+        filename: path of the JSON file holding the username and the access token.
+
+    Returns:
+        The credentials held in the file.
+    """
+    return GitCredentials(**json_loads(Path(filename).read_bytes()))
+
+
 def create_repository_client_from_path(
     credentials: GitCredentials, base_path: Path, charm_dir: str = ""
 ) -> Client:
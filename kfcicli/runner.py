@@ -0,0 +1,80 @@
+"""Module providing the shared entry point of the scripts."""
+
+import logging
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable
+
+from kfcicli.charms import LocalCharmRepo
+from kfcicli.main import KubeflowCI
+from kfcicli.repository import Client, read_credentials
+from kfcicli.utils import PathLike
+
+module_logger = logging.getLogger(__name__)
+
+
+@lru_cache
+def _read_client(preset: Path, mtime_ns: int, base_path: Path, credentials: str) -> KubeflowCI:
+    # The modification time is part of the key, so that an edited preset is read again
+    return KubeflowCI.read_cached(preset, base_path, read_credentials(credentials))
+
+
+def read_client(preset: PathLike, base_path: Path, credentials: PathLike) -> KubeflowCI:
+    """Build the client of the repositories of a preset, once per process for each version of it.
+
+    Args:
+        preset: file holding the list of repositories and charms.
+        base_path: folder where the repositories are cloned.
+        credentials: JSON file holding the credentials for Github.
+
+    Returns:
+        The client handling all the repositories of the preset.
+    """
+    preset = Path(preset).resolve()
+    return _read_client(preset, preset.stat().st_mtime_ns, base_path, str(credentials))
+
+
+def run(
+        script_id: str,
+        wrapper_func: Callable[[Client, list[LocalCharmRepo], bool], ...],
+        branch_name: str,
+        title: str,
+        body: str,
+        preset: PathLike,
+        base_path: Path,
+        credentials: PathLike,
+        dry_run: bool = False,
+        max_workers: int = 1
+) -> KubeflowCI:
+    """Run a script over all the repositories of a preset, opening a pull request for each of them.
+
+    Args:
+        script_id: identifier of the script, used for logging.
+        wrapper_func: function applying the changes to a repository, as required by
+            kfcicli.main.KubeflowCI.canon_run.
+        branch_name: name of the branch holding the changes.
+        title: title of the pull requests.
+        body: body of the pull requests.
+        preset: file holding the list of repositories and charms.
+        base_path: folder where the repositories are cloned.
+        credentials: JSON file holding the credentials for Github.
+        dry_run: whether to avoid pushing the changes and opening the pull requests.
+        max_workers: maximum number of repositories processed concurrently, to be raised only
+            for wrapper functions that are safe to run from several threads.
+
+    Returns:
+        The client handling all the repositories of the preset.
+    """
+    client = read_client(preset, base_path, credentials)
+
+    module_logger.info(f"Running {script_id} over the repositories of {preset}")
+    client.canon_run(
+        wrapper_func=wrapper_func,
+        branch_name=branch_name,
+        title=title,
+        body=body,
+        dry_run=dry_run,
+        max_workers=max_workers
+    )
+
+    return client
@@ -8,10 +8,20 @@ import re
 from configparser import ConfigParser
 from contextlib import contextmanager
 from logging import Logger, config, getLogger
+from pathlib import Path
 from typing import Any, Callable, Literal, TypedDict, TypeVar, TypeAlias
 
 from envyaml import EnvYAML
 
+try:
+    from orjson import dumps as json_dumps, loads as json_loads
+except ImportError:
+    # falling back to the standard library, with the same bytes-based interface as orjson:
+    def json_dumps(obj: Any) -> bytes:
+        return json.dumps(obj).encode()
+
+    json_loads = json.loads
+
 PathLike: TypeAlias = str | os.PathLike[str]
 
 LevelTypes = Literal[
@@ -147,6 +157,48 @@ def setup_logging(
     return logging.getLogger(logger_name) if logger_name else logging.root
 
 
+def list_files(directory: PathLike, suffixes: tuple[str, ...]) -> list[Path]:
+    """List the regular files of a directory whose names end with any of the given suffixes.
+
+    The entries yielded by os.scandir carry their file type, hence no additional stat call is
+    needed per file. A missing directory is considered empty.
+
+    :param directory: directory to be listed, not recursively
+    :param suffixes: accepted file name suffixes, e.g. (".yaml", ".yml")
+
+    :return: list of the matching file paths
+    """
+    try:
+        with os.scandir(directory) as entries:
+            return [
+                Path(entry.path) for entry in entries
+                if entry.name.endswith(suffixes) and entry.is_file(follow_symlinks=False)
+            ]
+    except FileNotFoundError:
+        return []
+
+
+def write_if_changed(path: PathLike, content: str) -> bool:
+    """Write a text file, unless it already holds the given content.
+
+    Unchanged files are left untouched, hence the return value can track whether a repository
+    was modified without asking git.
+
+    :param path: path of the file to be written
+    :param content: full content of the file
+
+    :return: whether the file was written
+    """
+    path = Path(path)
+    try:
+        if path.read_text() == content:
+            return False
+    except FileNotFoundError:
+        pass
+    path.write_text(content)
+    return True
+
+
 @contextmanager
 def environ(*remove, **update):
     """
@@ -1,14 +1,14 @@
 import logging
 from fileinput import filename
+from pathlib import Path
 
-from kfcicli.main import *
+from kfcicli.main import KubeflowCI
+from kfcicli.repository import read_credentials
 from kfcicli.utils import setup_logging
-import json
 
 setup_logging(log_level="INFO")
 
-with open("credentials.json", "r") as fid:
-    credentials = GitCredentials(**json.loads(fid.read()))
+credentials = read_credentials("credentials.json")
 
 tmp_folder = "/home/deusebio/tmp/kfcicli"
 
@@ -1,28 +1,31 @@
 from argparse import ArgumentParser
-from configparser import ConfigParser, NoOptionError
-from collections import OrderedDict
-from json import loads as json_loads
-from os import getenv, remove
+from asyncio import CancelledError, Semaphore, create_subprocess_exec, gather, run
+from configparser import NoOptionError
+from functools import lru_cache
+from hashlib import blake2b
+from os import cpu_count, getenv, killpg, remove, replace, scandir, utime
 from os.path import abspath, dirname, exists, join
 from pathlib import Path
-from re import search
-from shutil import copy
-from subprocess import CalledProcessError, DEVNULL, check_call
+from re import MULTILINE, compile as regex_compile, escape
+from signal import SIGKILL
+from subprocess import DEVNULL
 from sys import path as sys_path
+from tarfile import open as tar_open
+from tempfile import mkstemp
+from time import time
 from typing import Dict, List, Set, Tuple
 
-from tomlkit import dump as toml_dump, load as toml_load, table
+from tomlkit import document, dumps as toml_dumps, parse as toml_parse, table
 
 sys_path.append(abspath(join(dirname(__file__), "../../")))
 
 from kfcicli.main import (
     Client,
-    GitCredentials,
-    KubeflowCI,
     LocalCharmRepo,
     Path
 )
-from kfcicli.utils import setup_logging
+from kfcicli.runner import run as run_script
+from kfcicli.utils import list_files, setup_logging
 
 
 argument_parser = ArgumentParser()
@@ -44,6 +47,24 @@ argument_parser.add_argument(
     default=f"{home_folder}/.kfcicli/credentials.json",
     help="File holding the credentials for Github"
 )
+argument_parser.add_argument(
+    "--cache-path",
+    required=False,
+    default=f"{home_folder}/.cache/kf1288-poetry/",
+    help="Cache path where to store the outputs of already migrated charms"
+)
+argument_parser.add_argument(
+    "--cache-max-age-days",
+    required=False,
+    type=int,
+    default=30,
+    help="Number of days after their last use after which cached outputs are removed"
+)
+argument_parser.add_argument(
+    "--no-cache",
+    action="store_true",
+    help="Migrate every charm from scratch, without reading or storing cached outputs"
+)
 argument_parser.add_argument(
     "--log-level",
     required=False,
@@ -54,6 +75,9 @@ argument_parser.add_argument(
 script_arguments = argument_parser.parse_args()
 
 PATH_FOR_GITHUB_CREDENTIALS = script_arguments.credentials
+PATH_FOR_MIGRATION_CACHE = Path(script_arguments.cache_path)
+IS_MIGRATION_CACHE_ENABLED = not script_arguments.no_cache
+MIGRATION_CACHE_MAX_AGE_IN_SECONDS = script_arguments.cache_max_age_days * 24 * 60 * 60
 PATH_FOR_MODIFIED_REPOSITORIES = Path(script_arguments.base_path)
 PATH_FOR_REPOSITORY_LIST = Path(script_arguments.input)
 PATH_FOR_THIS_SCRIPT_SUBFOLDER = Path(__file__).parent
@@ -61,39 +85,225 @@ PATH_FOR_THIS_SCRIPT_SUBFOLDER = Path(__file__).parent
 ENVIRONMENT_NAME_FOR_CHARM = "charm"
 ENVIRONMENT_NAME_FOR_UNIT_TESTING = "unit"
 ENVIRONMENT_NAME_FOR_UPDATE_REQUIREMENTS = "update-requirements"
+PATH_FOR_CONTRIBUTING_FILE = PATH_FOR_THIS_SCRIPT_SUBFOLDER / "CONTRIBUTING.md"
 PATH_FOR_PULL_REQUEST_BODY_TEMPLATE = PATH_FOR_THIS_SCRIPT_SUBFOLDER / "pull_request_body_template.md"
 PATH_FOR_MODIFIED_CHARMCRAFT_LINES = PATH_FOR_THIS_SCRIPT_SUBFOLDER / "modified_charmcraft_lines"
+PATH_FOR_LOCK_UPDATE_SCRIPT = (PATH_FOR_THIS_SCRIPT_SUBFOLDER / "update-locked-requirements.sh").resolve()
+# bounding the lock file updates running at once, each of them resolving dependencies in its own process:
+MAX_CONCURRENT_CHARM_MIGRATIONS = cpu_count()
+MIGRATED_FILE_NAMES = ("charmcraft.yaml", "poetry.lock", "pyproject.toml", "tox.ini")
+# matching every codespell command, along with its backslash-continued lines:
+CODESPELL_COMMAND_REGEX = regex_compile(r"^([ \t]*codespell(?:[^\n]* \\[ \t]*\n)*[^\n]*)", MULTILINE)
+TOX_INI_OPTION_REGEX = regex_compile(r"^([^\s#;=\[][^=]*?)\s*=")
+TOX_INI_SECTION_REGEX = regex_compile(r"^\[([^\]]+)\]")
+REQUIREMENT_NAME_REGEX = regex_compile(r"[a-zA-Z0-9_\[\]-]*")
 REQUIREMENTS_FILE_NAME_BASE = "requirements"
 
+# static assets, read once for all repositories and charms:
+CONTRIBUTING_FILE_CONTENT = PATH_FOR_CONTRIBUTING_FILE.read_text()
+MODIFIED_CHARMCRAFT_LINES = PATH_FOR_MODIFIED_CHARMCRAFT_LINES.read_text().splitlines()
+PULL_REQUEST_BODY_TEMPLATE = PATH_FOR_PULL_REQUEST_BODY_TEMPLATE.read_text()
+
+# digest of the code and assets producing the migration, for cached migrations to be
+# invalidated whenever any of them changes:
+MIGRATION_ASSETS_DIGEST = blake2b(
+    b"".join(
+        asset_path.read_bytes()
+        for asset_path in (Path(__file__), PATH_FOR_MODIFIED_CHARMCRAFT_LINES, PATH_FOR_LOCK_UPDATE_SCRIPT)
+    ),
+    usedforsecurity=False
+).digest()
+
+REPLACEMENTS_FOR_CHECKOUT_AND_TOX_INSTALLATION = {
+    "actions/checkout@v2": "actions/checkout@v4",
+    "actions/checkout@v3": "actions/checkout@v4",
+    "pip install tox": "pipx install tox",
+}
+CHECKOUT_REGEX = regex_compile(r"actions/checkout@v[23]")
+CHECKOUT_AND_TOX_INSTALLATION_REGEX = regex_compile(
+    "|".join(escape(substring) for substring in REPLACEMENTS_FOR_CHECKOUT_AND_TOX_INSTALLATION)
+)
+
+COMMANDS_FOR_UPDATE_REQUIREMENTS = "\n".join((
+    "\n# updating all groups' locked dependencies:",
+    "poetry lock --regenerate",
+))
+COMMANDS_FOR_UPDATE_REQUIREMENTS_WITH_SUBCHARMS = "\n".join((
+    COMMANDS_FOR_UPDATE_REQUIREMENTS,
+    "# updating all groups' locked dependencies for every charm subfolder:",
+    r"""find charms/ -maxdepth 1 -mindepth 1 -type d -exec bash -c "cd {} && poetry lock --regenerate" \;""",
+))
+DESCRIPTION_FOR_UPDATE_REQUIREMENTS = "Update requirements"
+DESCRIPTION_FOR_UPDATE_REQUIREMENTS_WITH_SUBCHARMS = f"{DESCRIPTION_FOR_UPDATE_REQUIREMENTS}, including those in charm subfolders"
+
 
 logger = setup_logging(log_level=script_arguments.log_level, logger_name=__name__)
 
 
-def main() -> None:
-    logger.info(f"temporary repository directory: '{PATH_FOR_MODIFIED_REPOSITORIES}'")
+# line-oriented tox.ini editor, with a subset of the ConfigParser interface,
+# writing back the lines of untouched options verbatim for comments and
+# formatting to be preserved without any re-serialization:
+class ToxIniEditor:
+    def __init__(self, content: str):
+        # every section is a list of entries, each being either a raw line or
+        # an option, represented as a [name, lines] pair:
+        self._lines_above_first_section = []
+        self._sections = {}
+        self._continuation_indentation = None
+        self._ends_with_newline = content.endswith("\n")
+
+        entries = self._lines_above_first_section
+        current_option = None
+        for line in content.splitlines():
+            if current_option is not None and line[:1] in (" ", "\t") and line.strip():
+                current_option[1].append(line)
+                if self._continuation_indentation is None:
+                    self._continuation_indentation = line[:len(line) - len(line.lstrip())]
+                continue
+            current_option = None
+            if match := TOX_INI_SECTION_REGEX.match(line):
+                entries = self._sections.setdefault(match.group(1), [])
+                entries.append(line)
+            elif entries is not self._lines_above_first_section and (match := TOX_INI_OPTION_REGEX.match(line)):
+                current_option = [match.group(1).lower(), [line]]
+                entries.append(current_option)
+            else:
+                entries.append(line)
 
-    with open(PATH_FOR_GITHUB_CREDENTIALS, "r") as file:
-        credentials = GitCredentials(**json_loads(file.read()))
+        if self._continuation_indentation is None:
+            self._continuation_indentation = "    "
 
-    with open(PATH_FOR_PULL_REQUEST_BODY_TEMPLATE, "r") as file:
-        pull_request_body_template = file.read()
+    def _find_option(self, section: str, option: str) -> list | None:
+        return next(
+            (entry for entry in self._sections[section] if isinstance(entry, list) and entry[0] == option),
+            None
+        )
+
+    def sections(self) -> list[str]:
+        return list(self._sections)
+
+    def get(self, section: str, option: str) -> str:
+        if (entry := self._find_option(section, option)) is None:
+            raise NoOptionError(option, section)
+        first_line, *continuation_lines = entry[1]
+        value_lines = [first_line.split("=", 1)[1].strip()] + [line.strip() for line in continuation_lines]
+        return "\n".join(value_lines).rstrip()
+
+    def set(self, section: str, option: str, value: str) -> None:
+        first_value_line, *continuation_value_lines = value.split("\n")
+        lines = [f"{option} = {first_value_line}".rstrip()] + [
+            f"{self._continuation_indentation}{line}" for line in continuation_value_lines
+        ]
+
+        if (entry := self._find_option(section, option)) is not None:
+            entry[1] = lines
+            return
+
+        # adding new options before the blank and comment lines closing the section:
+        entries = self._sections[section]
+        entry_index = len(entries)
+        while entry_index > 1 and isinstance(entries[entry_index - 1], str) and (
+            not entries[entry_index - 1].strip() or entries[entry_index - 1].startswith(("#", ";"))
+        ):
+            entry_index -= 1
+        entries.insert(entry_index, [option, lines])
+
+    def remove_option(self, section: str, option: str) -> None:
+        self._sections[section] = [
+            entry for entry in self._sections[section]
+            if not (isinstance(entry, list) and entry[0] == option)
+        ]
+
+    def to_string(self) -> str:
+        lines = list(self._lines_above_first_section)
+        for entries in self._sections.values():
+            for entry in entries:
+                if isinstance(entry, list):
+                    lines.extend(entry[1])
+                else:
+                    lines.append(entry)
+        return "\n".join(lines) + ("\n" if self._ends_with_newline else "")
 
-    client = KubeflowCI.read(
-        filename=PATH_FOR_REPOSITORY_LIST,
-        base_path=PATH_FOR_MODIFIED_REPOSITORIES,
-        credentials=credentials
-    )
 
-    client.canon_run(
+def main() -> None:
+    logger.info(f"temporary repository directory: '{PATH_FOR_MODIFIED_REPOSITORIES}'")
+
+    if IS_MIGRATION_CACHE_ENABLED:
+        evict_expired_migrations_from_cache()
+
+    run_script(
+        "kf1288",
         wrapper_func=process_repository,
         branch_name="kf-7526/poetry-migration",
         title="build: migrate to poetry for Python dependency management",
-        body=pull_request_body_template,
+        body=PULL_REQUEST_BODY_TEMPLATE,
+        preset=PATH_FOR_REPOSITORY_LIST,
+        base_path=PATH_FOR_MODIFIED_REPOSITORIES,
+        credentials=PATH_FOR_GITHUB_CREDENTIALS,
         dry_run=False
     )
 
 
-def migrate_to_poetry(directory: Path, project: str, is_it_a_charm: bool) -> bool:
+def compute_migration_cache_key(directory: Path, project: str) -> str:
+    cache_key = blake2b(MIGRATION_ASSETS_DIGEST, usedforsecurity=False)
+    cache_key.update(project.encode())
+    input_file_paths = sorted(directory.glob(f"{REQUIREMENTS_FILE_NAME_BASE}*.in")) + sorted(
+        directory.glob(f"{REQUIREMENTS_FILE_NAME_BASE}*.txt")
+    )
+    input_file_paths += [directory / file_name for file_name in MIGRATED_FILE_NAMES if exists(directory / file_name)]
+    for input_file_path in input_file_paths:
+        cache_key.update(input_file_path.name.encode())
+        cache_key.update(input_file_path.read_bytes())
+    return cache_key.hexdigest()
+
+
+def evict_expired_migrations_from_cache() -> None:
+    if not exists(PATH_FOR_MIGRATION_CACHE):
+        return
+
+    # cache entries are touched whenever they are reused, hence only those left unused for too long
+    # are removed, along with the leftovers of interrupted writes:
+    expiration_time = time() - MIGRATION_CACHE_MAX_AGE_IN_SECONDS
+    for entry in scandir(PATH_FOR_MIGRATION_CACHE):
+        try:
+            if entry.stat().st_mtime < expiration_time:
+                remove(entry.path)
+        except FileNotFoundError:
+            # already removed by another run sharing the cache:
+            continue
+
+
+async def migrate_charm_to_poetry(directory: Path, project: str, semaphore: Semaphore) -> bool:
+    async with semaphore:
+        # a failing charm is reported as such, without interrupting the migration of the others:
+        try:
+            return await migrate_to_poetry(directory=directory, project=project, is_it_a_charm=True)
+        except Exception:
+            logger.exception(f"\t\tfailed migrating charm folder '{directory}'")
+            return False
+
+
+async def migrate_charms_to_poetry(directories: List[Path], project: str) -> List[bool]:
+    semaphore = Semaphore(MAX_CONCURRENT_CHARM_MIGRATIONS)
+    return await gather(*(
+        migrate_charm_to_poetry(directory=directory, project=project, semaphore=semaphore)
+        for directory in directories
+    ))
+
+
+async def migrate_to_poetry(directory: Path, project: str, is_it_a_charm: bool) -> bool:
+    # only charm folders are memoized, as locking a base project folder also
+    # updates the lock files of its charm subfolders:
+    cache_key = (
+        compute_migration_cache_key(directory=directory, project=project)
+        if is_it_a_charm and IS_MIGRATION_CACHE_ENABLED else None
+    )
+    if cache_key and restore_migration_from_cache(_dir=directory, cache_key=cache_key):
+        logger.info(f"\t\treused cached migration '{cache_key}' for '{directory}'")
+        return True
+
+    requirements_file_names = [path.name for path in directory.glob(f"{REQUIREMENTS_FILE_NAME_BASE}*")]
+
     if is_it_a_charm:
         update_charmcraft(_dir=directory)
     poetry_group_names_to_versioned_requirements = update_tox_ini(
@@ -104,7 +314,14 @@ def migrate_to_poetry(directory: Path, project: str, is_it_a_charm: bool) -> boo
         _dir=directory, project_name=project,
         poetry_group_names_to_versioned_requirements=poetry_group_names_to_versioned_requirements
     )
-    return update_lock_file_and_exported_charm_requirements(_dir=directory)
+    success = await update_lock_file_and_exported_charm_requirements(_dir=directory)
+
+    if success and cache_key:
+        store_migration_in_cache(
+            _dir=directory, cache_key=cache_key,
+            removed_file_names=[file_name for file_name in requirements_file_names if not exists(directory / file_name)]
+        )
+    return success
 
 
 def process_repository(repo: Client, charms: list[LocalCharmRepo], dry_run: bool) -> None:
@@ -112,120 +329,133 @@ def process_repository(repo: Client, charms: list[LocalCharmRepo], dry_run: bool
 
     commit_message = "docs: add instructions for dependency management"
     logger.info(f"\timplementing commit '{commit_message}'")
-    contributing_file_path_from_script = PATH_FOR_THIS_SCRIPT_SUBFOLDER / "CONTRIBUTING.md"
     contributing_file_path_in_repo = repo.base_path / "CONTRIBUTING.md"
-    if not exists(contributing_file_path_in_repo):
-        copy(contributing_file_path_from_script, contributing_file_path_in_repo)
-    else:
-        with open(contributing_file_path_from_script, "r") as source_file:
-            with open(contributing_file_path_in_repo, "a") as preexisting_target_file:
-                preexisting_target_file.write("\n\n")
-                preexisting_target_file.write(source_file.read())
-    if repo.is_dirty():
-        repo.update_branch(commit_msg=commit_message, directory=".", push=not dry_run, force=True)
+    # creating the file exclusively, to decide between writing and appending without a prior stat:
+    try:
+        with open(contributing_file_path_in_repo, "x") as target_file:
+            target_file.write(CONTRIBUTING_FILE_CONTENT)
+    except FileExistsError:
+        with open(contributing_file_path_in_repo, "a") as preexisting_target_file:
+            preexisting_target_file.write("\n\n")
+            preexisting_target_file.write(CONTRIBUTING_FILE_CONTENT)
+    # the file is either created or appended to, hence it is always modified:
+    repo.update_branch(commit_msg=commit_message, directory=".", push=not dry_run, force=True)
 
     commit_message = "ci: update checkout actions, tox installation and TIOBE schedule"
     logger.info(f"\timplementing commit '{commit_message}'")
-    for ci_file_path in (repo.base_path / ".github" / "workflows").glob("*.y*ml"):
+    are_ci_files_updated = False
+    for ci_file_path in list_files(repo.base_path / ".github" / "workflows", suffixes=(".yaml", ".yml")):
         is_it_the_tiobe_workflow = "tiobe" in str(ci_file_path)
-        with open(ci_file_path, "r") as file:
-            file_content = file.read()
+        file_content = ci_file_path.read_text()
         updated_file_content = update_tox_installation_and_checkout_actions(
             content=file_content,
             install_via_pipx=not is_it_the_tiobe_workflow,
             remove_on_pull_request=is_it_the_tiobe_workflow,
             remove_python_setup=not is_it_the_tiobe_workflow
         )
-        with open(ci_file_path, "w") as file:
-            file.write(updated_file_content)
-    if repo.is_dirty():
+        if updated_file_content == file_content:
+            continue
+        ci_file_path.write_text(updated_file_content)
+        are_ci_files_updated = True
+    if are_ci_files_updated:
         repo.update_branch(commit_msg=commit_message, directory=".", push=not dry_run, force=True)
 
     commit_message = "build: migrate to poetry for dependency management"
     logger.info(f"\timplementing all commits related to '{commit_message}'")
     project_name = repo.base_path.name
-    visited_charm_folders = set()
+    charm_folders_to_charms = {}
     for charm in charms:
+        charm_folders_to_charms.setdefault((repo.base_path / charm.tf_module).parent, charm)
+    # migrating all charm folders concurrently for their lock files to be
+    # updated in parallel, to then commit each charm on its own:
+    successes = run(migrate_charms_to_poetry(directories=list(charm_folders_to_charms), project=project_name))
+    for (charm_folder, charm), success in zip(charm_folders_to_charms.items(), successes):
         actual_commit_message = f"{commit_message} in charm '{charm.name}'"
         logger.info(f"\t\timplementing commit '{actual_commit_message}'")
-        charm_folder = (repo.base_path / charm.tf_module).parent
-        visited_charm_folders.add(charm_folder)
-        success = migrate_to_poetry(directory=charm_folder, project=project_name, is_it_a_charm=True)
-        if success and repo.is_dirty():
-            repo.update_branch(commit_msg=actual_commit_message, directory=".", push=not dry_run, force=True)
+        # checking the charm folder only, as other charms may have been left dirty by a failed migration:
+        if success and repo.is_dirty(directory=charm_folder):
+            repo.update_branch(commit_msg=actual_commit_message, directory=charm_folder, push=not dry_run, force=True)
         elif not success:
             logger.error(f"\t\tfailed implementing commit '{actual_commit_message}'")
     base_project_folder = repo.base_path
-    if base_project_folder not in visited_charm_folders:
+    if base_project_folder not in charm_folders_to_charms:
         actual_commit_message = f"{commit_message} in base project folder"
         logger.info(f"\t\timplementing commit '{actual_commit_message}'")
-        success = migrate_to_poetry(directory=base_project_folder, project=project_name, is_it_a_charm=False)
+        success = run(migrate_to_poetry(directory=base_project_folder, project=project_name, is_it_a_charm=False))
         if success and repo.is_dirty():
             repo.update_branch(commit_msg=actual_commit_message, directory=".", push=not dry_run, force=True)
         elif not success:
             logger.error(f"\t\tfailed implementing commit '{actual_commit_message}'")
 
+    if repo.is_dirty():
+        logger.warning(f"\tuncommitted changes left in repo at '{repo.base_path}'")
 
-def read_versioned_requirements_and_remove_files(file_dir: Path, file_name_base: str) -> Tuple[Dict[str, str], Set]:
-    requirement_name_regex = "[^a-zA-Z0-9-_\[\]]"
 
+def read_versioned_requirements_and_remove_files(file_dir: Path, file_name_base: str) -> Tuple[Dict[str, str], Set]:
     in_file_path = file_dir / f"{file_name_base}.in"
     txt_file = file_dir / f"{file_name_base}.txt"
 
-    requirements_to_version_contraints = {}
+    # requirement names map to their index in the list of version constraints,
+    # where unversioned requirements hold None until found in the .txt file:
+    requirement_indices = {}
+    version_constraints = []
     nested_dependency_groups = set()
 
     if exists(in_file_path):
-        unversioned_requirements = set()
-
-        with open(in_file_path, "r") as file:
-            content = file.read()
-        for line in content.splitlines():
-            line = line.strip()
-            if not line.startswith("#") and not line.startswith("-r") and line.strip():
-                first_match_not_composing_requirement_name = search(requirement_name_regex, line)
-                if first_match_not_composing_requirement_name is None:
-                    requirement = line.lower()
-                    unversioned_requirements.add(requirement)
+        # lines are decoded and stripped only once they are known not to be
+        # blank or commented out:
+        for line in in_file_path.read_bytes().splitlines():
+            if not line or line[:1] == b"#":
+                continue
+            line = line.decode().strip()
+            if not line or line.startswith("#"):
+                continue
+            if not line.startswith("-r"):
+                requirement_name_end_character_index = REQUIREMENT_NAME_REGEX.match(line).end()
+                requirement = line[:requirement_name_end_character_index].lower()
+                if requirement_name_end_character_index == len(line):
+                    version_constraint = None
                 else:
-                    requirement_name_end_character_index = first_match_not_composing_requirement_name.start()
-                    requirement = line[:requirement_name_end_character_index].lower()
                     version_constraint = line[requirement_name_end_character_index:].strip()
                     version_constraint = version_constraint.replace(" ", "")
-                    requirements_to_version_contraints[requirement] = version_constraint
-            elif line.startswith("-r"):
-                dependency_group = line.strip().split()[1].split(".")[0].replace(f"{REQUIREMENTS_FILE_NAME_BASE}", "")
+                requirement_index = requirement_indices.setdefault(requirement, len(version_constraints))
+                if requirement_index == len(version_constraints):
+                    version_constraints.append(version_constraint)
+                elif version_constraint is not None:
+                    # in case .in files contain any repeated requirements:
+                    version_constraints[requirement_index] = version_constraint
+            else:
+                dependency_group = line.split()[1].split(".")[0].replace(f"{REQUIREMENTS_FILE_NAME_BASE}", "")
                 if not dependency_group:
                     dependency_group = ENVIRONMENT_NAME_FOR_CHARM
                 else:
                     dependency_group = dependency_group[1:]  # removing the hyphen too
                 nested_dependency_groups.add(dependency_group)
 
-        if unversioned_requirements:
-            # in case .in files contain any repeated requirements:
-            for requirement in requirements_to_version_contraints:
-                if requirement in unversioned_requirements:
-                    unversioned_requirements.remove(requirement)
-
-            with open(txt_file, "r") as file:
-                content = file.read()
-            for line in content.splitlines():
-                if not line or line[0] in (" ", "#"):
+        n_unversioned_requirements = version_constraints.count(None)
+        if n_unversioned_requirements:
+            for line in txt_file.read_bytes().splitlines():
+                if not line or line[:1] in (b" ", b"#"):
                     continue
-                requirement_name_end_character_index = search(requirement_name_regex, line).start()
+                line = line.decode()
+                requirement_name_end_character_index = REQUIREMENT_NAME_REGEX.match(line).end()
                 requirement = line[:requirement_name_end_character_index]
-                version = line[requirement_name_end_character_index + 2:]  # excluding "=="
-                version = version.replace(" ", "")
-                if requirement in unversioned_requirements:
-                    unversioned_requirements.remove(requirement)
-                    requirements_to_version_contraints[requirement] = f"^{version}"  # caret pinning
-
-        assert not unversioned_requirements
+                requirement_index = requirement_indices.get(requirement)
+                if requirement_index is not None and version_constraints[requirement_index] is None:
+                    version = line[requirement_name_end_character_index + 2:]  # excluding "=="
+                    version = version.replace(" ", "")
+                    version_constraints[requirement_index] = f"^{version}"  # caret pinning
+                    n_unversioned_requirements -= 1
+                    # no need to go through the remaining transitive dependencies:
+                    if not n_unversioned_requirements:
+                        break
+
+        assert not n_unversioned_requirements
 
         remove(in_file_path)
         remove(txt_file)
 
-    return requirements_to_version_contraints, nested_dependency_groups
+    return dict(zip(requirement_indices, version_constraints)), nested_dependency_groups
 
 
 def replicate_initial_indentation(line: str) -> int:
@@ -235,68 +465,101 @@ def replicate_initial_indentation(line: str) -> int:
     return " " * n_trailing_whitespaces
 
 
-def update_charmcraft(_dir: Path) -> None:
-    charmcraft_path = _dir / "charmcraft.yaml"
+def restore_migration_from_cache(_dir: Path, cache_key: str) -> bool:
+    tarball_path = PATH_FOR_MIGRATION_CACHE / f"{cache_key}.tar"
+    removed_file_names_path = PATH_FOR_MIGRATION_CACHE / f"{cache_key}.removed"
 
-    with open(charmcraft_path, "r") as file:
-        original_charmcraft_lines = file.read().splitlines()
+    if not exists(tarball_path) or not exists(removed_file_names_path):
+        return False
 
-    updated_charmcraft_lines = []
+    with tar_open(tarball_path, "r") as tarball:
+        tarball.extractall(_dir, filter="data")
+    for file_name in removed_file_names_path.read_text().splitlines():
+        remove(_dir / file_name)
+    # marking the entry as recently used, for it not to be evicted:
+    utime(tarball_path)
+    utime(removed_file_names_path)
+    return True
 
-    # adding all before "parts":
-    line_index = 0
-    while not original_charmcraft_lines[line_index].startswith("parts:"):
-        updated_charmcraft_lines.append(original_charmcraft_lines[line_index])
-        line_index += 1
-    updated_charmcraft_lines.append(original_charmcraft_lines[line_index])
-    line_index += 1
 
-    # adding the intermediate, modified lines of "parts":
-    with open(PATH_FOR_MODIFIED_CHARMCRAFT_LINES, "r") as file:
-        intermediate_modified_charmcraft_lines = file.read().splitlines()
-    for line in intermediate_modified_charmcraft_lines:
-        updated_charmcraft_lines.append(line)
+def store_migration_in_cache(_dir: Path, cache_key: str, removed_file_names: List[str]) -> None:
+    PATH_FOR_MIGRATION_CACHE.mkdir(parents=True, exist_ok=True)
 
-    # finding the starting index of the "files" part:
-    line_index = len(original_charmcraft_lines) - 1
-    while not original_charmcraft_lines[line_index].startswith("  files:"):
-        line_index -= 1
+    # each file is written aside and then moved into place, for interrupted or concurrent writes
+    # never to leave a partial entry; the tarball is moved last, as its presence marks the cache
+    # entry as complete:
+    file_descriptor, temporary_file_path = mkstemp(dir=PATH_FOR_MIGRATION_CACHE, suffix=".tmp")
+    with open(file_descriptor, "w") as file:
+        file.write("\n".join(removed_file_names))
+    replace(temporary_file_path, PATH_FOR_MIGRATION_CACHE / f"{cache_key}.removed")
 
-    # adding the "files" part with the comments above:
-    while line_index < len(original_charmcraft_lines):
-        updated_charmcraft_lines.append(original_charmcraft_lines[line_index])
-        line_index += 1
+    file_descriptor, temporary_file_path = mkstemp(dir=PATH_FOR_MIGRATION_CACHE, suffix=".tmp")
+    with open(file_descriptor, "wb") as file, tar_open(fileobj=file, mode="w") as tarball:
+        for file_name in MIGRATED_FILE_NAMES:
+            if exists(_dir / file_name):
+                tarball.add(_dir / file_name, arcname=file_name)
+    replace(temporary_file_path, PATH_FOR_MIGRATION_CACHE / f"{cache_key}.tar")
 
-    updated_charmcraft_lines.append("")
 
-    with open(charmcraft_path, "w") as file:
-        file.write("\n".join(updated_charmcraft_lines))
+def update_charmcraft(_dir: Path) -> None:
+    charmcraft_path = _dir / "charmcraft.yaml"
+
+    original_charmcraft_lines = charmcraft_path.read_text().splitlines()
 
+    # finding the "parts" line and the starting line of the "files" part:
+    parts_line_index = next(
+        (line_index for line_index, line in enumerate(original_charmcraft_lines) if line.startswith("parts:")),
+        None
+    )
+    if parts_line_index is None:
+        raise ValueError(f"no 'parts:' line found in '{charmcraft_path}'")
+    files_line_index = next(
+        (
+            line_index for line_index in range(len(original_charmcraft_lines) - 1, -1, -1)
+            if original_charmcraft_lines[line_index].startswith("  files:")
+        ),
+        None
+    )
+    if files_line_index is None:
+        raise ValueError(f"no '  files:' part found in '{charmcraft_path}'")
+
+    # adding all before "parts", the intermediate modified lines of "parts" and
+    # the "files" part with the comments above:
+    updated_charmcraft_lines = (
+        original_charmcraft_lines[:parts_line_index + 1]
+        + MODIFIED_CHARMCRAFT_LINES
+        + original_charmcraft_lines[files_line_index:]
+        + [""]
+    )
 
-def update_lock_file_and_exported_charm_requirements(_dir: Path) -> bool:
-    script_name = "update-locked-requirements.sh"
-    script_path_in_repo = _dir / script_name
+    charmcraft_path.write_text("\n".join(updated_charmcraft_lines))
 
-    copy(script_name, script_path_in_repo)
 
+async def update_lock_file_and_exported_charm_requirements(_dir: Path) -> bool:
+    process = await create_subprocess_exec(
+        "/bin/bash", PATH_FOR_LOCK_UPDATE_SCRIPT, cwd=_dir, stdout=DEVNULL, stderr=DEVNULL,
+        # running in its own process group, for poetry to be stopped along with the script:
+        start_new_session=True
+    )
     try:
-        check_call(["/bin/bash", script_name], cwd=_dir, stdout=DEVNULL, stderr=DEVNULL)
-        return True
-    except CalledProcessError:
-        return False
-    finally:
-        remove(script_path_in_repo)
+        return await process.wait() == 0
+    except CancelledError:
+        # not leaving the lock update running once its migration is abandoned:
+        if process.returncode is None:
+            killpg(process.pid, SIGKILL)
+            await process.wait()
+        raise
 
 
-def update_pyproject_toml(_dir: Path, project_name: str, poetry_group_names_to_versioned_requirements: OrderedDict[str, Dict[str, str]]) -> None:
+def update_pyproject_toml(_dir: Path, project_name: str, poetry_group_names_to_versioned_requirements: Dict[str, Dict[str, str]]) -> None:
     pyproject_toml_file_path = _dir / "pyproject.toml"
 
-    if not exists(pyproject_toml_file_path):
-        with open(pyproject_toml_file_path, "w") as file:
-            pass
-
-    with open(pyproject_toml_file_path, "r") as file:
-        pyproject_toml_content = toml_load(file)
+    # editing the parsed document rather than plain dicts, for the comments and formatting of the
+    # untouched sections to be kept; a missing file starts from an empty document, without creating it first:
+    try:
+        pyproject_toml_content = toml_parse(pyproject_toml_file_path.read_text())
+    except FileNotFoundError:
+        pyproject_toml_content = document()
 
     project_section = table()
     project_section.add("name", project_name)
@@ -332,37 +595,18 @@ def update_pyproject_toml(_dir: Path, project_name: str, poetry_group_names_to_v
                 group_dependency_section.add(dependency_name, dependency_spec)
         pyproject_toml_content["tool"]["poetry"]["group"][group_name]["dependencies"] = group_dependency_section
 
-    with open(pyproject_toml_file_path, "w") as file:
-        toml_dump(pyproject_toml_content, file)
+    pyproject_toml_file_path.write_text(toml_dumps(pyproject_toml_content))
 
 
-def update_tox_ini(_dir: Path, are_there_subcharms: bool) -> OrderedDict[str, Dict[str, str]]:
+def update_tox_ini(_dir: Path, are_there_subcharms: bool) -> Dict[str, Dict[str, str]]:
     tox_ini_file_path = _dir / "tox.ini"
 
-    # removing the first comment lines to then add them back at the end for
-    # the subsequent trick of preserving comments to be feasible:
-    with open(tox_ini_file_path, "r") as file:
-        lines = file.read().splitlines(keepends=True)
-    copyright_lines = []
-    for line in lines:
-        if line.startswith("#") or line == "\n":
-            copyright_lines.append(line)
-        else:
-            break
-    with open(tox_ini_file_path, "w") as file:
-        file.writelines(lines[len(copyright_lines):])
-
-    # tricking ConfigParser into believing that lines starting with "#" or ";"
-    # are not comments but keys without a value:
-    # https://stackoverflow.com/questions/21476554/update-ini-file-without-removing-comments
-    tox_ini_parser = ConfigParser(comment_prefixes="€", allow_no_value=True)
-
-    tox_ini_parser.read(tox_ini_file_path)
+    tox_ini_parser = ToxIniEditor(tox_ini_file_path.read_text())
 
     tox_ini_parser.set("testenv", "deps", "\npoetry>=2.1.3")
 
     environment_prefix = "testenv:"
-    poetry_group_names_to_versioned_requirements = OrderedDict()
+    poetry_group_names_to_versioned_requirements = {}
 
     poetry_group_names_to_versioned_requirements[ENVIRONMENT_NAME_FOR_CHARM], nested_dependency_groups = (
         read_versioned_requirements_and_remove_files(file_dir=_dir, file_name_base=REQUIREMENTS_FILE_NAME_BASE)
@@ -394,22 +638,12 @@ def update_tox_ini(_dir: Path, are_there_subcharms: bool) -> OrderedDict[str, Di
             tox_ini_parser.set(
                 section_name,
                 "commands",
-                "\n".join(
-                    (
-                        "\n# updating all groups' locked dependencies:",
-                        "poetry lock --regenerate",
-                        "# updating all groups' locked dependencies for every charm subfolder:",
-                        """find charms/ -maxdepth 1 -mindepth 1 -type d -exec bash -c "cd {} && poetry lock --regenerate" \;""",
-                    ) if are_there_subcharms else (
-                        "\n# updating all groups' locked dependencies:",
-                        "poetry lock --regenerate",
-                    )
-                )
+                COMMANDS_FOR_UPDATE_REQUIREMENTS_WITH_SUBCHARMS if are_there_subcharms else COMMANDS_FOR_UPDATE_REQUIREMENTS
             )
             tox_ini_parser.set(
                 section_name,
                 "description",
-                "Update requirements" + (", including those in charm subfolders" if are_there_subcharms else "")
+                DESCRIPTION_FOR_UPDATE_REQUIREMENTS_WITH_SUBCHARMS if are_there_subcharms else DESCRIPTION_FOR_UPDATE_REQUIREMENTS
             )
             if are_there_subcharms:
                 tox_ini_parser.set(section_name, "allowlist_externals", "find")
@@ -427,84 +661,58 @@ def update_tox_ini(_dir: Path, are_there_subcharms: bool) -> OrderedDict[str, Di
             """
             stringified_commands = tox_ini_parser.get(section_name, "commands")
             if "codespell" in stringified_commands:
-                lines = stringified_commands.splitlines(keepends=True)
-                updated_lines = []
-                line_index = 0
-                while line_index < len(lines):
-                    codespell_word_hit = False
-                    while line_index < len(lines):
-                        if lines[line_index].strip().startswith("codespell"):
-                            codespell_word_hit = True
-                            break
-                        updated_lines.append(lines[line_index])
-                        line_index += 1
-                    while line_index < len(lines) and lines[line_index].strip().endswith(" \\"):
-                        updated_lines.append(lines[line_index])
-                        line_index += 1
-                    if line_index < len(lines):
-                        updated_lines.append(lines[line_index])
-                        line_index += 1
-                    if codespell_word_hit:
-                        updated_lines[-1] = f"{updated_lines[-1][:-1]} \\\n"
-                        updated_lines.append("--skip *.lock\n")
-                        codespell_word_hit = False
-                tox_ini_parser.set(section_name, "commands", "".join(updated_lines))
+                tox_ini_parser.set(
+                    section_name,
+                    "commands",
+                    CODESPELL_COMMAND_REGEX.sub(r"\1 \\\n--skip *.lock", stringified_commands)
+                )
 
         tox_ini_parser.remove_option(section_name, "deps")
         tox_ini_parser.set(section_name, "skip_install", "true")
 
-    with open(tox_ini_file_path, "w") as file:
-        tox_ini_parser.write(file)
-
-    # adding back the first comment lines for the above-mentioned trick, while
-    # also removing the sporious, duplicate final whitespace:
-    with open(tox_ini_file_path, "r") as file:
-        lines = file.read().splitlines(keepends=True)
-    with open(tox_ini_file_path, "w") as file:
-        file.writelines(copyright_lines + lines[:-1])
+    tox_ini_file_path.write_text(tox_ini_parser.to_string())
 
     return poetry_group_names_to_versioned_requirements
 
 
+# many repositories share verbatim copies of the same workflow files:
+@lru_cache(maxsize=256)
 def update_tox_installation_and_checkout_actions(
     content: str,
     install_via_pipx: bool,
     remove_on_pull_request: bool,
     remove_python_setup: bool
 ) -> str:
-    # TODO: improve time complexity with more of an efficient implementation
-
     updated_lines = []
     n_subsequent_lines_to_skip = 0
 
     for line in content.splitlines():
+        # stripping each line once, to then compare from its first non-space character on:
+        stripped_line = line.strip()
+
         if n_subsequent_lines_to_skip > 0:
             n_subsequent_lines_to_skip -= 1
             # if not at the end of the block or at the end of the block with an empty newline:
-            if n_subsequent_lines_to_skip > 0 or not line.strip():
+            if n_subsequent_lines_to_skip > 0 or not stripped_line:
                 continue
 
-        if remove_on_pull_request and line.strip() == "pull_request:":
+        if remove_on_pull_request and stripped_line == "pull_request:":
             continue
 
-        if remove_python_setup and "- name: Set up Python" in line:
+        if remove_python_setup and stripped_line.startswith("- name: Set up Python"):
             n_subsequent_lines_to_skip = 4
             continue
 
-        processed_line = (
-            line
-            .replace("actions/checkout@v2", "actions/checkout@v4")
-            .replace("actions/checkout@v3", "actions/checkout@v4")
-        )
-
-        if install_via_pipx:
-            processed_line = processed_line.replace("pip install tox", "pipx install tox")
-
-        updated_lines.append(processed_line)
+        updated_lines.append(line)
 
     updated_lines.append("")
 
-    return "\n".join(updated_lines)
+    # replacing all the outdated substrings in a single pass over the kept lines:
+    replacement_regex = CHECKOUT_AND_TOX_INSTALLATION_REGEX if install_via_pipx else CHECKOUT_REGEX
+    return replacement_regex.sub(
+        lambda match: REPLACEMENTS_FOR_CHECKOUT_AND_TOX_INSTALLATION[match.group(0)],
+        "\n".join(updated_lines)
+    )
 
 
 if __name__ == "__main__":
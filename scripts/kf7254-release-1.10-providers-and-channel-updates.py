@@ -1,17 +1,14 @@
-import json
+from pathlib import Path
 
-from kfcicli.main import *
+from kfcicli.runner import read_client
 from kfcicli.utils import setup_logging
 
 setup_logging(log_level="INFO")
 
-with open("credentials.json", "r") as fid:
-    credentials = GitCredentials(**json.loads(fid.read()))
-
 base_path = ...
 repository_file = Path("presets/release-1.10.yaml")
 
-client = KubeflowCI.read(repository_file, base_path, credentials)
+client = read_client(repository_file, base_path, "credentials.json")
 
 client.cut_release(
     "kf-7254-release-1.10",
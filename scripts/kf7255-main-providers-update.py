@@ -1,22 +1,15 @@
-from kfcicli.main import *
+from pathlib import Path
+
+from kfcicli.main import Client, LocalCharmRepo
+from kfcicli.runner import run
 from kfcicli.utils import setup_logging
-import json
 
 setup_logging(log_level="INFO")
 
-with open("credentials.json", "r") as fid:
-    credentials = GitCredentials(**json.loads(fid.read()))
-
 base_path = ...
 
 filename=Path("./presets/kubeflow-repos.yaml")
 
-client = KubeflowCI.read(
-    filename=filename,
-    base_path=base_path,
-    credentials=credentials
-)
-
 def update_tf_provider(juju_tf_version):
     def wrapper(repo: Client, charms: list[LocalCharmRepo], dry_run: bool):
         from kfcicli.terraform import set_version_field
@@ -36,11 +29,16 @@ def update_tf_provider(juju_tf_version):
 
     return wrapper
 
-client.canon_run(
+run(
+    "kf7255",
     wrapper_func=update_tf_provider(">= 0.14.0"),
     branch_name="kf-7255-update-tf-provider",
     title="[KF-7255] Update Juju provider",
     body="Updating juju provider requirement to >=0.14.0",
-    dry_run=False
+    preset=filename,
+    base_path=base_path,
+    credentials="credentials.json",
+    dry_run=False,
+    max_workers=8
 )
 
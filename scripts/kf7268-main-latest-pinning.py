@@ -1,22 +1,15 @@
-from kfcicli.main import *
+from pathlib import Path
+
+from kfcicli.main import Client, LocalCharmRepo
+from kfcicli.runner import run
 from kfcicli.utils import setup_logging
-import json
 
 setup_logging(log_level="INFO")
 
-with open("credentials.json", "r") as fid:
-    credentials = GitCredentials(**json.loads(fid.read()))
-
 base_path = ...
 
 filename=Path("./presets/kubeflow-repos.yaml")
 
-client = KubeflowCI.read(
-    filename=filename,
-    base_path=base_path,
-    credentials=credentials
-)
-
 
 def update_channel(channel: str):
     def wrapper(repo: Client, charms: list[LocalCharmRepo], dry_run: bool):
@@ -37,10 +30,15 @@ def update_channel(channel: str):
 
     return wrapper
 
-client.canon_run(
+run(
+    "kf7268",
     wrapper_func=update_channel("latest/edge"),
     branch_name="kf-7268-pin-channel-edge",
     title="[KF-7268] chore: pin channel to latest/edge",
     body="Pin channel to latest/edge",
-    dry_run=False
+    preset=filename,
+    base_path=base_path,
+    credentials="credentials.json",
+    dry_run=False,
+    max_workers=8
 )
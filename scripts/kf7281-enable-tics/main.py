@@ -1,119 +1,122 @@
+import io
 import logging
 import os
 
+from functools import lru_cache
 from pathlib import Path
-from kfcicli.main import GitCredentials, KubeflowCI, Client
+from kfcicli.main import Client
 from kfcicli.charms import LocalCharmRepo
-from kfcicli.utils import setup_logging, CommentConfigParser as ConfigParser
-import json
+from kfcicli.runner import run
+from kfcicli.utils import setup_logging, write_if_changed, CommentConfigParser as ConfigParser
 import jinja2
 
 CURRENT_FOLDER = Path(__file__).parent
 
-def reformat_tox(filename: Path):
-    """Import and export a tox file to get the formatting right.
+TEMPLATES_ENVIRONMENT = jinja2.Environment(loader=jinja2.FileSystemLoader(CURRENT_FOLDER))
 
-    This is a function with side-effects, that modify the underlying file.
+
+@lru_cache(maxsize=None)
+def _template(name: str) -> jinja2.Template:
+    """Load and compile a template of this folder, only once across all repositories.
 
     Args:
-        filename: Path, name of the file to be re-formatted
+        name: str, file name of the template
     """
-    config = ConfigParser()
-
-    config.read(filename)
-    with open(filename, 'w') as configfile:
-        config.write(configfile)
+    return TEMPLATES_ENVIRONMENT.get_template(name)
 
 
-def add_coverage(filename: Path) -> bool:
-    """Adding the coverage XML report when running the tox unit env.
+def process_tox(filename: Path) -> tuple[bool, bool]:
+    """Reformat a tox file and add the coverage XML report when running the tox unit env.
 
+    The file is parsed once: importing and exporting it gets the formatting right,
+    while the unit env is amended in between.
     This is a function with side-effects, that modify the underlying file.
 
     Args:
-        filename: Path, name of the tox.ini file to be amended
+        filename: Path, name of the tox.ini file to be re-formatted and amended
 
     Returns:
-        true if the file was modified, false if it didn't have the unit env.
+        tuple of two booleans: whether the file has the unit env and whether it was modified.
     """
+    original_content = filename.read_text()
 
     config = ConfigParser()
+    config.read_string(original_content, source=str(filename))
 
-    config.read(filename)
-
-    if (
-            not "testenv:unit" in config.sections()
-    ):
-        return False
+    unit_exists = "testenv:unit" in config.sections()
 
-    if "coverage xml" not in config["testenv:unit"]["commands"]:
+    if unit_exists and "coverage xml" not in config["testenv:unit"]["commands"]:
         config["testenv:unit"]["commands"] += "\ncoverage xml"
 
-        with open(filename, 'w') as configfile:
-            config.write(configfile)
+    with io.StringIO() as configfile:
+        config.write(configfile)
+        content = configfile.getvalue()
+
+    if content == original_content:
+        return unit_exists, False
 
-    return True
+    filename.write_text(content)
+    return unit_exists, True
 
-def _single_repo_tics(repo_name: str, filename: Path):
+def _single_repo_tics(repo_name: str, filename: Path) -> bool:
     """Create TIOBE scan workflow for a single charm repository.
 
-    This is a function with side-effects, that creates or overwrites the underlying file.
+    This is a function with side-effects, that creates or overwrites the underlying file when its content changes.
 
     Args:
         repo_name: str, name of the repository / project to be used in TIOBE
         filename: Path, name of the Github Action file
-    """
 
-    template = CURRENT_FOLDER / "tics-single-repo.yaml.j2"
+    Returns:
+        true if the file was created or modified, false if it was already up to date.
+    """
 
-    env = jinja2.Environment()
-    with open(template, "r") as fid:
-        template = env.from_string(fid.read())
+    template = _template("tics-single-repo.yaml.j2")
 
-    with open(filename, "w") as fid:
-        fid.write(template.render(
-            project_name=repo_name,
-            tics_auth_token="${{ secrets.TICSAUTHTOKEN }}"
-        ))
+    return write_if_changed(filename, template.render(
+        project_name=repo_name,
+        tics_auth_token="${{ secrets.TICSAUTHTOKEN }}"
+    ))
 
 
-def _multi_repo_tics(repo_name: str, charms: list[LocalCharmRepo], filename: Path):
+def _multi_repo_tics(repo_name: str, charms: list[LocalCharmRepo], filename: Path) -> bool:
     """Create TIOBE scan workflow for a multi charm repository.
 
-    This is a function with side-effects, that creates or overwrites the underlying file.
+    This is a function with side-effects, that creates or overwrites the underlying file when its content changes.
 
     Args:
         repo_name: str, name of the repository / project to be used in TIOBE
         charms: list[kfcicli.charms.LocalCharmRepo], list of charms to be included in tiobe scanning
         filename: Path, name of the Github Action file
-    """
-    template = CURRENT_FOLDER / "tics-single-repo.yaml.j2"
 
-    env = jinja2.Environment()
-    with open(template, "r") as fid:
-        template = env.from_string(fid.read())
+    Returns:
+        true if the file was created or modified, false if it was already up to date.
+    """
+    template = _template("tics-single-repo.yaml.j2")
 
     input_dict = {
         charm.metadata.name: str(charm.tf_module.parent)
         for charm in charms
     }
 
-    with open(filename, "w") as fid:
-        fid.write(template.render(
-            project_name=repo_name,
-            tics_auth_token="${{ secrets.TICSAUTHTOKEN }}",
-            charms=input_dict
-        ))
+    return write_if_changed(filename, template.render(
+        project_name=repo_name,
+        tics_auth_token="${{ secrets.TICSAUTHTOKEN }}",
+        charms=input_dict
+    ))
 
 
-def create_tics_file(repo: Client, charms: list[LocalCharmRepo]):
+def create_tics_file(repo: Client, charms: list[LocalCharmRepo]) -> bool:
     """Create TIOBE scan workflow for a repository (either single-charm or multi-charm).
 
-    This is a function with side-effects, that creates or overwrites the underlying file.
+    This is a function with side-effects, that creates or overwrites the underlying file when its content changes.
 
     Args:
         repo: kfcicli.repository.Client, client instance representing the repository
         charms: list[kfcicli.charms.LocalCharmRepo], list of charms in the repository
+
+    Returns:
+        true if the file was created or modified, false if it was already up to date.
     """
 
     filename = repo.base_path / ".github" / "workflows" / "tiobe_scan.yml"
@@ -122,9 +125,9 @@ def create_tics_file(repo: Client, charms: list[LocalCharmRepo]):
     # Note that checking that there is only 1 charm is not enough, since there exists
     # repositories with multi-charm structure but only one charm (e.g. argo-operators)
     if len(charms)==1 and str(charms[0].tf_module) == "terraform":
-        _single_repo_tics(repo.base_path.name, filename)
+        return _single_repo_tics(repo.base_path.name, filename)
     else:
-        _multi_repo_tics(repo.base_path.name, charms, filename)
+        return _multi_repo_tics(repo.base_path.name, charms, filename)
 
 
 def main(repo: Client, charms: list[LocalCharmRepo], dry_run: bool):
@@ -134,35 +137,29 @@ def main(repo: Client, charms: list[LocalCharmRepo], dry_run: bool):
     """
 
     charms_with_unit = []
+    modified_charm_names = []
 
     for charm in charms:
         if not (filename := charm.metadata.file.parent / "tox.ini").exists():
             continue
 
-        # reformatting tox.ini file to be machine-generated and handled
-        reformat_tox(filename)
-
-        if repo.is_dirty():
-            repo.update_branch(
-                commit_msg=f"Reformatting tox for charm {charm.name}", directory=".",
-                push=not dry_run, force=True
-            )
-
+        # reformatting tox.ini file to be machine-generated and handled, and
         # coverage.xml generation when running unit tests
-        unit_exists = add_coverage(filename)
+        unit_exists, modified = process_tox(filename)
         if unit_exists:
             charms_with_unit.append(charm)
+        if modified:
+            modified_charm_names.append(charm.name)
 
-        if repo.is_dirty():
-            repo.update_branch(
-                commit_msg=f"Adding coverage for charm {charm.name}", directory=".",
-                push=not dry_run, force=True
-            )
+    # committing the tox.ini files of all charms at once, only tracking the files actually modified
+    if modified_charm_names:
+        repo.update_branch(
+            commit_msg=f"Reformatting tox and adding coverage for charms {', '.join(modified_charm_names)}",
+            directory=".", push=not dry_run, force=True
+        )
 
     # creating tiobe_scan.yaml file
-    create_tics_file(repo, charms_with_unit)
-
-    if repo.is_dirty():
+    if create_tics_file(repo, charms_with_unit):
         repo.update_branch(
             commit_msg=f"Adding TICS file", directory=".",
             push=not dry_run, force=True
@@ -199,19 +196,16 @@ if __name__ == "__main__":
 
     setup_logging(log_level=args.log_level)
 
-    with open(args.credentials, "r") as fid:
-        credentials = GitCredentials(**json.loads(fid.read()))
-
-    base_path = Path(args.base_path)
-    repository_file = Path(args.input)
-
-    client = KubeflowCI.read(repository_file, base_path, credentials)
-
-    client.canon_run(
+    run(
+        "kf7281",
         wrapper_func=main,
         branch_name="kf-7281-implementing-tics",
         title="[KF-7281] Enabling TIOBE scan",
         body=PR_BODY,
-        dry_run=False
+        preset=args.input,
+        base_path=Path(args.base_path),
+        credentials=args.credentials,
+        dry_run=False,
+        max_workers=8
     )
 
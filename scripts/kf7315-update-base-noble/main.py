@@ -1,18 +1,16 @@
-import os
-import shutil
+import logging
+import re
 import subprocess
+from pathlib import Path
 
-import oyaml as yaml
+from ruamel.yaml import YAML
 
-from kfcicli.main import *
-from kfcicli.utils import setup_logging
-import json
+from kfcicli.main import Client, LocalCharmRepo
+from kfcicli.runner import run
+from kfcicli.utils import list_files, setup_logging, write_if_changed
 
 logger = setup_logging(log_level="INFO", logger_name=__name__)
 
-with open("/home/deusebio/.kfcicli/credentials.json", "r") as fid:
-    credentials = GitCredentials(**json.loads(fid.read()))
-
 tmp_folder = "/home/deusebio/.kfcicli"
 
 filename=Path("./presets/kubeflow-repos.yaml")
@@ -20,38 +18,47 @@ filename=Path("./presets/kubeflow-repos.yaml")
 # This only contains the adminssion-webhook and katib operators
 filename=Path("./presets/test.main.yaml")
 
-client = KubeflowCI.read(
-    filename=filename,
-    base_path=Path(f"{tmp_folder}"),
-    credentials=credentials
-)
-
 CURRENT_FOLDER = Path(__file__).parent
 
-def update_deps(script: Path, path: Path) -> bool:
+UPDATE_DEPS_SCRIPT = CURRENT_FOLDER / "update-deps.sh"
+
+CHARMCRAFT_CONTENT = (CURRENT_FOLDER / "charmcraft.yaml").read_text()
+
+def _workflow_yaml() -> YAML:
+    # Round-trip loading keeps comments, quotes, formatting and the "on" key of the workflows.
+    # A YAML instance holds its parsing state, hence it is not shared across the repository threads
+    workflow_yaml = YAML(typ="rt")
+    workflow_yaml.preserve_quotes = True
+    workflow_yaml.indent(mapping=2, sequence=4, offset=2)
+    workflow_yaml.width = 4096
+    return workflow_yaml
 
-    shutil.copy(script, path / script.name)
+CHECKOUT_REGEX = re.compile(r"actions/checkout")
 
+def update_deps(script: Path, path: Path) -> bool:
+    # The script only relies on its working directory, hence it is run in place
     try:
-        subprocess.check_call(["/bin/bash", script.name], cwd=path)
+        subprocess.check_call(["/bin/bash", str(script.resolve())], cwd=path)
         return True
     except subprocess.CalledProcessError:
         return False
-    finally:
-        os.remove(path / script.name )
-
-def remove_python_step(steps: dict):
-    return [
-        step
-        for step in steps
-        if "setup-python" not in step.get("uses", "")
-    ]
 
-def add_python_step(steps: list[dict], python_version: str = "3.12"):
-    idx = [
+def remove_python_step(steps: list[dict]) -> bool:
+    python_step_indices = [
         ith for ith, step in enumerate(steps)
-        if "actions/checkout" in step.get("uses", "")
+        if "setup-python" in step.get("uses", "")
     ]
+    # Deleting in place from the end, so that the comments of the other steps stay attached to them
+    for ith in reversed(python_step_indices):
+        del steps[ith]
+    return bool(python_step_indices)
+
+def add_python_step(steps: list[dict], python_version: str = "3.12"):
+    # Only the first checkout step is needed, hence stopping at it
+    idx = next(
+        (ith for ith, step in enumerate(steps) if CHECKOUT_REGEX.search(step.get("uses", ""))),
+        None
+    )
 
     python_step = {
         "name": f"Set up Python {python_version}",
@@ -59,83 +66,81 @@ def add_python_step(steps: list[dict], python_version: str = "3.12"):
         "with": {"python-version": python_version}
     }
 
-    if not idx:
+    if idx is None:
         return [python_step] + steps
 
-    return steps[:(idx[0]+1)] + [python_step] + steps[(idx[0]+1):]
+    return steps[:(idx+1)] + [python_step] + steps[(idx+1):]
 
-def refactor_ci(ci: dict):
-    from collections import OrderedDict
-    jobs =  OrderedDict()
-    for job_name, job in ci["jobs"].items():
+def refactor_ci(ci: dict) -> bool:
+    modified = False
+    for job in ci["jobs"].values():
         if "steps" in job:
-            job["steps"] = remove_python_step(job["steps"])
-            jobs[job_name] = job
-        else:
-            jobs[job_name] = job
-    ci["jobs"] = jobs
-    return ci
+            modified |= remove_python_step(job["steps"])
+    return modified
 
 def update_base(repo: Client, charms: list[LocalCharmRepo], dry_run: bool):
 
-    for charm in charms:
-
-        charm_folder = ( repo.base_path / charm.tf_module ).parent
+    charm_folders = [( repo.base_path / charm.tf_module ).parent for charm in charms]
 
-        shutil.copy(CURRENT_FOLDER / "charmcraft.yaml", charm_folder / "charmcraft.yaml" )
-
-        if repo.is_dirty():
-            repo.update_branch(
-                commit_msg=f"updating charmcraft for charm {charm.name}",
-                directory=".",
-                push=not dry_run, force=True
-            )
+    # Each change is applied to all charms first, and then committed once
+    # Files written by this script are tracked directly, rather than asking git whether the repo is dirty
+    updated_charm_names = [
+        charm.name
+        for charm, charm_folder in zip(charms, charm_folders)
+        if write_if_changed(charm_folder / "charmcraft.yaml", CHARMCRAFT_CONTENT)
+    ]
 
-        success = update_deps(CURRENT_FOLDER / "update-deps.sh", charm_folder )
+    if updated_charm_names:
+        repo.update_branch(
+            commit_msg=f"updating charmcraft for charms {', '.join(updated_charm_names)}",
+            directory=".",
+            push=not dry_run, force=True
+        )
 
-        if not success:
+    # The dependencies are updated by an external script, hence only git knows about its changes.
+    # Each charm folder is checked and committed on its own, so that the changes left by a failed
+    # update never end up in the commit of another charm
+    for charm, charm_folder in zip(charms, charm_folders):
+        if not update_deps(UPDATE_DEPS_SCRIPT, charm_folder ):
             logging.warning(f"Failing to update dependencies on charm {charm.name}")
-
-        if success and repo.is_dirty():
+        elif repo.is_dirty(directory=charm_folder):
             repo.update_branch(
                 commit_msg=f"updating deps for charm {charm.name}",
-                directory=".",
+                directory=charm_folder,
                 push=not dry_run, force=True
             )
 
-    for ci_file in (repo.base_path / ".github" / "workflows").glob("*.yaml"):
+    workflows_folder = repo.base_path / ".github" / "workflows"
+    are_ci_files_updated = False
+    for ci_file in list_files(workflows_folder, suffixes=(".yaml", ".yml")):
 
         logger.info(f"Updating file {ci_file}")
-        with open(ci_file, "r") as fid:
-            ci = yaml.safe_load(fid)
-
-        hash_1 = hash(json.dumps(ci))
-
-        new_ci = refactor_ci(ci)
+        content = ci_file.read_text()
 
-        hash_2 = hash(json.dumps(new_ci))
-
-        if hash_1 != hash_2:
+        # Only files mentioning a Python setup step can be refactored, hence the others are not parsed
+        workflow_yaml = _workflow_yaml()
+        if "setup-python" in content and refactor_ci(ci := workflow_yaml.load(content)):
             logger.info(f"Changes detected in file {ci_file}. Overwriting...")
-            with open(ci_file, "w") as fid:
-                yaml.dump(new_ci, fid)
-
-            subprocess.check_output([
-                "sed", '-i', 's/^true:/on:/g', str(ci_file)
-            ])
+            workflow_yaml.dump(ci, ci_file)
+            are_ci_files_updated = True
         else:
             logger.info(f"No changes found in file {ci_file}")
 
-    if repo.is_dirty():
+    if are_ci_files_updated:
         repo.update_branch(
-            commit_msg=f"Updating GitHub action file", directory=".",
+            commit_msg=f"Updating GitHub action file", directory=workflows_folder,
             push=not dry_run, force=True
         )
 
-client.canon_run(
+run(
+    "kf7315",
     wrapper_func=update_base,
     branch_name="kf-7315-update-base",
     title="[KF-7315] Update bases to 24.04",
     body="PR for updating bases to 24.04, and updating also python dependencies",
-    dry_run=False
+    preset=filename,
+    base_path=Path(f"{tmp_folder}"),
+    credentials=f"{tmp_folder}/credentials.json",
+    dry_run=False,
+    max_workers=8
 )